@@ -2,13 +2,19 @@ from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import List
 from db.database import init_db
-from models.users import get_user, get_all_users, create_user, update_user, delete_user
-from models.doors import get_door, get_all_doors, create_door, update_door, delete_door
+from models.users import get_user, get_all_users, get_all_users_json, create_user, update_user, delete_user
+from models.doors import get_door, get_all_doors, get_all_doors_json, create_door, update_door, delete_door
 from models.access import get_all_access_for_user, get_access, grant_access, revoke_access
-from fastapi import Body
+from fastapi import Body, BackgroundTasks
 from fastapi import Request, Response, UploadFile, File
+from fastapi import WebSocket, WebSocketDisconnect, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 import os
+import json
+import time
+import asyncio
 from datetime import timedelta, datetime
 from dotenv import load_dotenv
 import secrets
@@ -17,24 +23,39 @@ import torch.nn as nn
 import torchvision.models as models
 import numpy as np
 import cv2
-from models.logs import add_log, get_logs
-
-from preprocessing import preprocess_image, transform_test
-from model_loader import load_model, predict_tensor
+from models.changes import get_changes_since, get_latest_seq
+from models.logs import add_log, get_logs, get_logs_json
+from serialization import json_response
+
+from preprocessing import prepare_tensor
+from runtime_profile import profile, apply_threads
+from model_loader import predict_tensor, predict_probs, embed_batch
+from model_registry import ModelRegistry
+from streaming import FrameStream, STATIC, RECHECK, CHANGED
+from gallery import EmbeddingGallery, GalleryNotReady
+from uploads import UploadLimitMiddleware, read_upload_image
 from config import ALLOWED_EXT, CLASSES, IMAGE_SIZE
+from config import WS_MAX_SIZE
+from config import CHANGE_FEED_LIMIT, CHANGE_POLL_INTERVAL, SSE_HEARTBEAT
 
 load_dotenv()
 
 # Initialize DB
 init_db()
 
-model = load_model()
+apply_threads(profile)
+registry = ModelRegistry()
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 print(f"Model Loaded on {device}")
 
+gallery = EmbeddingGallery()
+print(f"Embedding gallery loaded with {len(gallery)} identities")
+
 
 app = FastAPI(title="Access Control API")
 
+# Added first so CORS wraps it and rejections still carry CORS headers
+app.add_middleware(UploadLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"], 
@@ -72,8 +93,8 @@ class AccessUpdate(BaseModel):
 # ------------------- Users -------------------
 
 @app.get("/users")
-def api_get_users():
-    return get_all_users()
+def api_get_users(request: Request):
+    return json_response(request, get_all_users_json())
 
 @app.get("/users/{user_id}")
 def api_get_user(user_id: str):
@@ -102,14 +123,15 @@ def api_delete_user(user_id: str):
     if not get_user(user_id):
         raise HTTPException(status_code=404, detail="User not found")
     delete_user(user_id)
+    gallery.remove(user_id)
     return {"message": "User deleted successfully"}
 
 
 # ------------------- Doors -------------------
 
 @app.get("/doors")
-def api_get_doors():
-    return get_all_doors()
+def api_get_doors(request: Request):
+    return json_response(request, get_all_doors_json())
 
 @app.get("/doors/{door_id}")
 def api_get_door(door_id: str):
@@ -183,6 +205,58 @@ def api_revoke_access(payload: dict = Body(...)):
     return {"message": "Access revoked successfully"}
 
 
+# ------------------- Access Change Feed -------------------
+
+@app.get("/changes")
+def api_get_changes(since: int = 0, limit: int = Query(CHANGE_FEED_LIMIT, ge=0, le=CHANGE_FEED_LIMIT)):
+    """
+    Grants, revocations and user/door deletes after cursor `since`.
+    limit=0 returns only the current cursor (take it before a full reload).
+    """
+    if limit == 0:
+        return {"changes": [], "cursor": get_latest_seq(), "has_more": False}
+
+    changes = get_changes_since(since, limit)
+    cursor = changes[-1]["seq"] if changes else since
+    return {"changes": changes, "cursor": cursor, "has_more": len(changes) == limit}
+
+@app.get("/changes/stream")
+async def api_stream_changes(request: Request, since: int = None):
+    """Server-Sent Events stream of changes; resumes from Last-Event-ID on reconnect."""
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    if since is None:
+        since = await run_in_threadpool(get_latest_seq)
+
+    async def events():
+        cursor = since
+        idle = 0.0
+        yield "retry: 3000\n\n"
+        while not await request.is_disconnected():
+            changes = await run_in_threadpool(get_changes_since, cursor, CHANGE_FEED_LIMIT)
+            for change in changes:
+                cursor = change["seq"]
+                yield f"id: {cursor}\nevent: change\ndata: {json.dumps(change)}\n\n"
+
+            if changes:
+                idle = 0.0
+                if len(changes) == CHANGE_FEED_LIMIT:
+                    continue
+            elif idle >= SSE_HEARTBEAT:
+                idle = 0.0
+                yield ": keep-alive\n\n"
+
+            await asyncio.sleep(CHANGE_POLL_INTERVAL)
+            idle += CHANGE_POLL_INTERVAL
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 #------------------- Admin -------------------
 ADMIN_USERNAME = os.getenv("ADMIN_USERNAME")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD")
@@ -204,6 +278,11 @@ def validate_session(token: str):
         del sessions[token]
     return False
 
+def require_admin(request: Request):
+    session_token = request.cookies.get("admin_session")
+    if not session_token or not validate_session(session_token):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
 @app.post("/admin/login")
 def admin_login(data: dict, response: Response):
     username = data.get("username")
@@ -255,27 +334,34 @@ def admin_check(request: Request):
 
 # ------------------- Thermal Image Prediction -------------------
 
-@app.post("/predict")
-async def predict_thermal_image(file: UploadFile = File(...)):
+async def read_image_tensor(file: UploadFile):
+    """Validate, decode and preprocess an uploaded image into a (1, H, W) tensor."""
     filename = file.filename.lower()
 
     if not filename.endswith(ALLOWED_EXT):
         raise HTTPException(status_code=400, detail="Invalid image format")
 
-    # Read & decode image
-    bytes_data = await file.read()
-    arr = np.frombuffer(bytes_data, np.uint8)
-    img = cv2.imdecode(arr, cv2.IMREAD_GRAYSCALE)
-
-    if img is None:
-        raise HTTPException(status_code=422, detail="Could not decode image")
+    # Stream into a pooled buffer, sniff the header, then decode
+    img = await read_upload_image(file)
 
     # Preprocessing
-    processed = preprocess_image(img)
-    tensor = transform_test(processed).unsqueeze(0).to(device)
+    return prepare_tensor(img)
+
 
-    # Predict
+@app.post("/predict")
+async def predict_thermal_image(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+    tensor = (await read_image_tensor(file)).unsqueeze(0).to(device)
+
+    # Predict (holding a reference keeps this request on one model across a hot-swap)
+    model = registry.current()
+    start = time.perf_counter()
     label, confidence = predict_tensor(model, tensor)
+    active_ms = (time.perf_counter() - start) * 1000
+
+    # Shadow scoring runs after the response is sent
+    candidate = registry.shadow_target()
+    if candidate is not None:
+        background_tasks.add_task(registry.record_shadow, candidate, tensor, label, active_ms)
 
     return {
         "file": file.filename,
@@ -283,13 +369,163 @@ async def predict_thermal_image(file: UploadFile = File(...)):
         "confidence": confidence
     }
 
+
+@app.websocket("/ws/predict")
+async def stream_thermal_frames(websocket: WebSocket):
+    """
+    Live recognition over a stream of thermal frames.
+
+    Text messages configure the stream: {"width": W, "height": H} for raw
+    uint8 grayscale frames, or {"action": "reset"} to start a new door event.
+    Binary messages are frames (raw or encoded images) of at most
+    WS_MAX_SIZE bytes. A {"type": "decision", ...} message is sent once the
+    prediction is confident.
+    """
+    await websocket.accept()
+    stream = FrameStream()
+
+    async def run_pending():
+        batch = stream.take_batch()
+        probs = await run_in_threadpool(predict_probs, registry.current(), batch)
+        decision = stream.update(probs)
+        if decision:
+            await websocket.send_json(decision)
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            if message.get("text") is not None:
+                try:
+                    data = json.loads(message["text"])
+                    if data.get("action") == "reset":
+                        stream.reset()
+                    if "width" in data and "height" in data:
+                        stream.configure(data["width"], data["height"])
+                except (ValueError, TypeError, AttributeError):
+                    await websocket.send_json({"type": "error", "detail": "Invalid control message"})
+                continue
+
+            # Also capped by the server (ws_max_size) when started as below; this
+            # keeps the limit when it isn't, e.g. a plain `uvicorn app:app`
+            data = message.get("bytes") or b""
+            if len(data) > WS_MAX_SIZE:
+                await websocket.send_json({"type": "error", "detail": "Frame too large"})
+                continue
+            try:
+                img = stream.decode(data)
+                state = stream.gate(img) if img is not None else None
+                if state in (CHANGED, RECHECK):
+                    stream.queue(await run_in_threadpool(prepare_tensor, img))
+            except (cv2.error, ValueError):
+                img = None
+            if img is None:
+                await websocket.send_json({"type": "error", "detail": "Could not decode frame"})
+                continue
+
+            if state in (CHANGED, RECHECK):
+                if stream.batch_ready():
+                    await run_pending()
+            elif state == STATIC and stream.pending:
+                # Scene is static: flush what we have rather than wait for a full batch
+                await run_pending()
+    except WebSocketDisconnect:
+        pass
+
+
+# ------------------- Model Versions -------------------
+
+class ModelLoad(BaseModel):
+    checkpoint: str
+    version: str = None
+    shadow: bool = False
+    shadow_fraction: float = 0.1
+
+@app.get("/admin/model")
+def api_model_status(request: Request):
+    require_admin(request)
+    # The gallery only serves the model it was calibrated with
+    return {**registry.status(), "gallery_model": gallery.model}
+
+@app.post("/admin/model/load", status_code=202)
+def api_load_model(request: Request, payload: ModelLoad, background_tasks: BackgroundTasks):
+    """Load a checkpoint from MODEL_DIR in the background, warm it, then swap it in (or shadow it)."""
+    require_admin(request)
+    if registry.loading:
+        raise HTTPException(status_code=409, detail=f"Already loading version {registry.loading}")
+    if not 0.0 <= payload.shadow_fraction <= 1.0:
+        raise HTTPException(status_code=400, detail="shadow_fraction must be between 0 and 1")
+
+    background_tasks.add_task(
+        registry.load, payload.checkpoint, payload.version, payload.shadow, payload.shadow_fraction
+    )
+    return {"message": "Model load started", "checkpoint": payload.checkpoint, "shadow": payload.shadow}
+
+@app.post("/admin/model/promote")
+def api_promote_model(request: Request):
+    require_admin(request)
+    if not registry.promote():
+        raise HTTPException(status_code=404, detail="No shadow candidate loaded")
+    return {"message": "Candidate promoted", "active": registry.active.info()}
+
+@app.delete("/admin/model/candidate")
+def api_clear_candidate(request: Request):
+    require_admin(request)
+    registry.clear_candidate()
+    return {"message": "Shadow candidate removed"}
+
+# ------------------- Embedding Gallery -------------------
+
+@app.post("/gallery/{user_id}")
+async def api_enroll_identity(user_id: str, files: List[UploadFile] = File(...)):
+    """Enroll (or re-enroll) a user from one or more thermal images."""
+    if not get_user(user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+
+    # One ModelVersion for both, so a hot-swap mid-request can't mix models
+    active = registry.current_version()
+    batch = torch.stack([await read_image_tensor(f) for f in files])
+    embeddings = await run_in_threadpool(embed_batch, active.model, batch)
+    try:
+        await run_in_threadpool(gallery.enroll, user_id, embeddings, active.fingerprint)
+    except GalleryNotReady as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"message": "Identity enrolled successfully", "images": len(files), "gallery_size": len(gallery)}
+
+@app.delete("/gallery/{user_id}")
+def api_remove_identity(user_id: str):
+    if not gallery.remove(user_id):
+        raise HTTPException(status_code=404, detail="Identity not enrolled")
+    return {"message": "Identity removed successfully", "gallery_size": len(gallery)}
+
+@app.post("/identify")
+async def identify_thermal_image(file: UploadFile = File(...)):
+    """Open-set identification against the enrolled gallery (no retraining needed)."""
+    active = registry.current_version()
+    tensor = (await read_image_tensor(file)).unsqueeze(0)
+    embedding = (await run_in_threadpool(embed_batch, active.model, tensor))[0]
+    try:
+        identity, similarity = await run_in_threadpool(gallery.identify, embedding, active.fingerprint)
+    except GalleryNotReady as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    return {
+        "file": file.filename,
+        "identity": identity,
+        "similarity": similarity,
+        "recognized": identity is not None,
+    }
+
 # ------------------- logs-------------------
 @app.get("/logs")
-def api_get_logs():
+def api_get_logs(request: Request):
     """Return all logs sorted in descending timestamp order."""
     try:
-        logs = get_logs()
-        return logs
+        return json_response(request, get_logs_json())
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -326,3 +562,11 @@ def api_write_log(payload: dict):
         return {"message": "Log entry stored successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to write log: {e}")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # Equivalent CLI start (the size must match config.WS_MAX_SIZE):
+    #   uvicorn app:app --host 0.0.0.0 --port 8000 --ws-max-size 8388608
+    uvicorn.run(app, host="0.0.0.0", port=8000, ws_max_size=WS_MAX_SIZE)
@@ -0,0 +1,221 @@
+"""
+Inference runtime autotuner.
+
+Sweeps torch intra/inter-op thread counts, batch size, backend (eager vs
+TorchScript-traced) and preprocessing path on this host with synthetic
+thermal inputs, then writes the fastest setting that meets the per-batch
+latency target to the runtime profile picked up by load_model and the
+serving layer. The live stream batch size is chosen separately, for the
+shortest inference time to a decision.
+
+Run from backend/:
+    python autotune.py --target-p99-ms 25
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import time
+
+import numpy as np
+
+from config import IMAGE_SIZE, RUNTIME_PROFILE_PATH, STREAM_WINDOW, STREAM_MIN_FRAMES
+
+BATCH_SIZES = (1, 2, 4, 8, 16, 32)
+BACKENDS = ("eager", "traced")
+PREPROCESS_TOLERANCE = 0.02   # max mean abs diff (0-1 scale) allowed for the cv2 path
+
+
+def synthetic_frames(n, shape, seed=0):
+    """Smooth warm blobs on a cool background plus sensor noise, as uint8 frames."""
+    rng = np.random.default_rng(seed)
+    h, w = shape
+    yy, xx = np.mgrid[0:h, 0:w]
+    frames = []
+    for _ in range(n):
+        cy, cx = rng.uniform(0.3, 0.7) * h, rng.uniform(0.3, 0.7) * w
+        sigma = rng.uniform(0.15, 0.3) * min(h, w)
+        blob = np.exp(-((yy - cy) ** 2 + (xx - cx) ** 2) / (2 * sigma ** 2))
+        img = 60 + 150 * blob + rng.normal(0, 6, (h, w))
+        frames.append(np.clip(img, 0, 255).astype(np.uint8))
+    return frames
+
+
+def percentiles(samples_ms):
+    arr = np.asarray(samples_ms)
+    return float(np.percentile(arr, 50)), float(np.percentile(arr, 99))
+
+
+# ---- Model sweep (runs in a fresh process per thread setting) ----
+def measure_threads(intra, inter, batch_sizes, backends, iters):
+    import torch
+
+    torch.set_num_threads(intra)
+    torch.set_num_interop_threads(inter)
+
+    from model_loader import ThermalCNN, TracedThermalCNN, predict_probs, device
+
+    eager = ThermalCNN().to(device).eval()
+    models = {"eager": eager}
+    if "traced" in backends:
+        models["traced"] = TracedThermalCNN(eager)
+
+    results = []
+    for backend in backends:
+        model = models[backend]
+        for bs in batch_sizes:
+            batch = torch.rand((bs, 1, *IMAGE_SIZE))
+            for _ in range(5):
+                predict_probs(model, batch)
+
+            times = []
+            start = time.perf_counter()
+            for _ in range(iters):
+                t0 = time.perf_counter()
+                predict_probs(model, batch)
+                times.append((time.perf_counter() - t0) * 1000)
+            elapsed = time.perf_counter() - start
+
+            p50, p99 = percentiles(times)
+            results.append({
+                "intra_op_threads": intra,
+                "inter_op_threads": inter,
+                "backend": backend,
+                "batch_size": bs,
+                "throughput": bs * iters / elapsed,
+                "batch_p50_ms": p50,
+                "batch_p99_ms": p99,
+            })
+    return results
+
+
+def sweep_model(thread_options, batch_sizes, backends, iters):
+    ctx = mp.get_context("spawn")
+    results = []
+    for intra, inter in thread_options:
+        with ctx.Pool(1) as pool:
+            rows = pool.apply(measure_threads, (intra, inter, batch_sizes, backends, iters))
+        for r in rows:
+            print(
+                f"  intra={intra:<2} inter={inter:<2} {r['backend']:<6} bs={r['batch_size']:<3}"
+                f" {r['throughput']:9.1f} img/s  batch p50={r['batch_p50_ms']:7.2f} ms  p99={r['batch_p99_ms']:7.2f} ms"
+            )
+        results.extend(rows)
+    return results
+
+
+# ---- Preprocessing sweep ----
+def sweep_preprocess(frames):
+    import cv2
+    from preprocessing import prepare_tensor
+
+    cv2.setNumThreads(1)
+    timings = {}
+    outputs = {}
+    for method in ("pil", "cv2"):
+        prepare_tensor(frames[0], method)
+        start = time.perf_counter()
+        outputs[method] = [prepare_tensor(f, method) for f in frames]
+        timings[method] = (time.perf_counter() - start) * 1000 / len(frames)
+
+    diff = float(np.mean([
+        (a - b).abs().mean().item() for a, b in zip(outputs["pil"], outputs["cv2"])
+    ]))
+    for method, ms in timings.items():
+        print(f"  {method:<4} {ms:7.3f} ms/frame")
+    print(f"  mean abs diff cv2 vs pil: {diff:.4f}")
+
+    use_cv2 = timings["cv2"] < timings["pil"] and diff <= PREPROCESS_TOLERANCE
+    return ("cv2" if use_cv2 else "pil"), timings, diff
+
+
+def pick(results, target_p99_ms):
+    """Highest throughput meeting the per-batch p99 target, else the lowest p99."""
+    ok = [r for r in results if r["batch_p99_ms"] <= target_p99_ms]
+    if ok:
+        return max(ok, key=lambda r: r["throughput"]), True
+    return min(results, key=lambda r: r["batch_p99_ms"]), False
+
+
+def pick_stream(results, best):
+    """
+    Stream batch size for the chosen threads/backend that minimises inference
+    time to a first decision (STREAM_MIN_FRAMES frames), capped so a batch
+    never exceeds the smoothing window.
+    """
+    cap = min(STREAM_WINDOW, STREAM_MIN_FRAMES)
+    rows = [
+        r for r in results
+        if r["batch_size"] <= cap
+        and r["backend"] == best["backend"]
+        and r["intra_op_threads"] == best["intra_op_threads"]
+        and r["inter_op_threads"] == best["inter_op_threads"]
+    ]
+
+    def decision_ms(r):
+        return -(-STREAM_MIN_FRAMES // r["batch_size"]) * r["batch_p99_ms"]
+
+    chosen = min(rows, key=decision_ms)
+    return chosen["batch_size"], decision_ms(chosen)
+
+
+def main(argv=None):
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Autotune ThermalCNN inference on this host.")
+    parser.add_argument("--target-p99-ms", type=float, default=50.0, help="per-batch p99 latency target")
+    parser.add_argument("--iters", type=int, default=50, help="timed runs per configuration")
+    parser.add_argument("--frame-size", type=int, nargs=2, default=(240, 320), metavar=("H", "W"),
+                        help="synthetic camera frame size for the preprocessing sweep")
+    parser.add_argument("-o", "--output", default=RUNTIME_PROFILE_PATH)
+    parser.add_argument("--dry-run", action="store_true", help="print the profile without writing it")
+    args = parser.parse_args(argv)
+
+    intra_options = sorted({t for t in (1, 2, 4, 8, cpus) if t <= cpus})
+    inter_options = sorted({t for t in (1, 2) if t <= cpus})
+    thread_options = [(i, j) for i in intra_options for j in inter_options]
+
+    print(f"\nModel sweep ({cpus} CPUs, target p99 {args.target_p99_ms} ms)")
+    results = sweep_model(thread_options, BATCH_SIZES, BACKENDS, args.iters)
+    best, met = pick(results, args.target_p99_ms)
+    stream_batch, stream_decision_ms = pick_stream(results, best)
+
+    print("\nPreprocessing sweep")
+    frames = synthetic_frames(200, tuple(args.frame_size))
+    preprocess, timings, diff = sweep_preprocess(frames)
+
+    tuned = {
+        "intra_op_threads": best["intra_op_threads"],
+        "inter_op_threads": best["inter_op_threads"],
+        "batch_size": best["batch_size"],
+        "stream_batch_size": stream_batch,
+        "backend": best["backend"],
+        "preprocess": preprocess,
+        "measured": {
+            "throughput": best["throughput"],
+            "batch_p50_ms": best["batch_p50_ms"],
+            "batch_p99_ms": best["batch_p99_ms"],
+            "target_p99_ms": args.target_p99_ms,
+            "latency_scope": (
+                "per batch of batch_size; each request in a batch waits for the whole "
+                "batch plus the time to fill it, so this is not per-request latency"
+            ),
+            "stream_decision_ms": stream_decision_ms,
+            "target_met": met,
+            "preprocess_ms": timings,
+            "preprocess_diff": diff,
+            "cpus": cpus,
+        },
+    }
+
+    if not met:
+        print(f"\nNo configuration met batch p99 <= {args.target_p99_ms} ms; using the lowest-latency one.")
+    print("\n" + json.dumps(tuned, indent=2))
+
+    if not args.dry_run:
+        with open(args.output, "w") as f:
+            json.dump(tuned, f, indent=2)
+        print(f"\nRuntime profile -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
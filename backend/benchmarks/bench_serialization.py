@@ -0,0 +1,95 @@
+"""
+Serialization benchmark for list endpoints.
+
+Run from backend/:  python -m benchmarks.bench_serialization [rows]
+"""
+import gzip
+import json
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+from serialization import encode_cursor, json_object_sql, brotli
+from models.logs import LOG_COLUMNS
+from config import GZIP_LEVEL, BROTLI_QUALITY
+
+
+def build_db(n):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""
+        CREATE TABLE logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            user_name TEXT NOT NULL,
+            door_id TEXT NOT NULL,
+            door_location TEXT NOT NULL,
+            status TEXT NOT NULL
+        )
+    """)
+    start = datetime(2025, 1, 1)
+    conn.executemany(
+        "INSERT INTO logs (timestamp, user_id, user_name, door_id, door_location, status) VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            (
+                (start + timedelta(seconds=i)).isoformat(),
+                f"S{i % 10 + 1}",
+                f"User{i % 10 + 1}",
+                f"D{i % 10 + 1:03d}",
+                "Vault A - Main Asset Storage",
+                "SUCCESS" if i % 3 else "DENIED",
+            )
+            for i in range(n)
+        ),
+    )
+    conn.execute("CREATE INDEX idx_logs_timestamp ON logs(timestamp)")
+    conn.commit()
+    return conn
+
+
+def timed(label, fn, repeat=5):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    print(f"  {label:<34} {best * 1000:9.1f} ms")
+    return result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    conn = build_db(n)
+    query = "SELECT * FROM logs ORDER BY timestamp DESC"
+
+    print(f"\nSerializing {n} log rows (brotli={'yes' if brotli else 'no'})\n")
+
+    def baseline():
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(query).fetchall()
+        conn.row_factory = None
+        return json.dumps([dict(r) for r in rows]).encode("utf-8")
+
+    def fast():
+        return encode_cursor(conn.execute(
+            f"SELECT {json_object_sql(LOG_COLUMNS)} FROM logs ORDER BY timestamp DESC"
+        ))
+
+    ref = timed("dict(row) + json.dumps", baseline)
+    body = timed("encode_cursor", fast)
+    assert json.loads(body) == json.loads(ref), "encoded payload mismatch"
+
+    print(f"\n  raw size                           {len(body) / 1024:9.1f} KiB")
+    gz = timed(f"gzip (level {GZIP_LEVEL})", lambda: gzip.compress(body, compresslevel=GZIP_LEVEL), repeat=3)
+    print(f"  gzip size                          {len(gz) / 1024:9.1f} KiB")
+    if brotli is not None:
+        br = timed(f"brotli (quality {BROTLI_QUALITY})", lambda: brotli.compress(body, quality=BROTLI_QUALITY), repeat=3)
+        print(f"  brotli size                        {len(br) / 1024:9.1f} KiB")
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Embedding gallery calibration.
+
+Embeds a labelled set of thermal images (label from the filename, as in
+predict_script.py), measures genuine and impostor similarities and writes
+the centring mean and reject threshold used by /identify and /gallery.
+
+Run from backend/ (the gallery must be empty, or pass --reset):
+    python calibrate_gallery.py path/to/images --far 0.01
+"""
+import argparse
+import json
+import os
+import tempfile
+
+import numpy as np
+from torch.utils.data import DataLoader
+
+from config import GALLERY_DIR, GALLERY_TARGET_FAR, MODEL_PATH
+from gallery import EmbeddingGallery, calibrate
+from model_loader import load_model, embed_batch
+from model_registry import checkpoint_fingerprint
+from predict_script import ThermalImageDataset, collate, worker_init, list_images, extract_label
+from runtime_profile import profile, apply_threads
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate the embedding gallery on labelled images.")
+    parser.add_argument("source", help="directory, .zip or .tar(.gz) of labelled images")
+    parser.add_argument("--checkpoint", default=MODEL_PATH, help="model the gallery will be used with")
+    parser.add_argument("--version", help="version name to record (default: checkpoint file name)")
+    parser.add_argument("--far", type=float, default=GALLERY_TARGET_FAR, help="target impostor accept rate")
+    parser.add_argument("--gallery", default=GALLERY_DIR)
+    parser.add_argument("--reset", action="store_true", help="remove enrolled identities first")
+    parser.add_argument("--dry-run", action="store_true", help="print the calibration without writing it")
+    parser.add_argument("-b", "--batch-size", type=int, default=profile["batch_size"])
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    apply_threads(profile)
+    model = load_model(args.checkpoint, strict=True)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root, names, archive = list_images(args.source, tmpdir)
+        if not names:
+            raise SystemExit("No images found")
+
+        loader = DataLoader(
+            ThermalImageDataset(root, names, archive),
+            batch_size=args.batch_size,
+            num_workers=args.workers,
+            collate_fn=collate,
+            worker_init_fn=worker_init if args.workers else None,
+        )
+        embeddings, labels = [], []
+        for batch, idxs, _ in loader:
+            if batch is None:
+                continue
+            embeddings.append(embed_batch(model, batch))
+            labels.extend(extract_label(names[i]) or "" for i in idxs)
+
+    try:
+        result = calibrate(np.concatenate(embeddings), labels, args.far)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    model_info = {
+        "version": args.version or os.path.splitext(os.path.basename(args.checkpoint))[0],
+        "fingerprint": checkpoint_fingerprint(args.checkpoint),
+    }
+    print(json.dumps({"threshold": result["threshold"], "model": model_info, **result["stats"]}, indent=2))
+
+    if args.dry_run:
+        return
+    gallery = EmbeddingGallery(args.gallery)
+    if args.reset:
+        gallery.clear()
+    try:
+        gallery.set_calibration(result["center"], result["threshold"], model_info, result["stats"])
+    except ValueError as e:
+        raise SystemExit(f"{e} (pass --reset)")
+    print(f"\nGallery calibration -> {gallery.calibration_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,3 +7,47 @@ IMAGE_SIZE = (64, 64)
 CLASSES = ['S1', 'S10', 'S2', 'S3', 'S4', 'S5', 'S6', 'S7', 'S8', 'S9']
 
 ALLOWED_EXT = (".jpg", ".jpeg", ".png", ".bmp")
+
+# Response compression (bytes / levels)
+COMPRESSION_MIN_SIZE = 1024
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+# Streaming recognition (/ws/predict)
+STREAM_FRAME_SKIP = 2          # consider every Nth frame
+STREAM_MOTION_THRESHOLD = 4.0  # mean abs pixel diff (0-255) to re-run inference
+STREAM_STATIC_REINFER = 3      # re-run inference on every Nth static frame
+STREAM_BATCH_SIZE = 4
+STREAM_WINDOW = 8              # frames in the smoothing window
+STREAM_MIN_FRAMES = 4
+STREAM_CONFIDENCE = 0.85
+
+# Embedding gallery (open-set identification)
+EMBEDDING_DIM = 256
+GALLERY_DIR = "gallery"
+GALLERY_TARGET_FAR = 0.01      # impostor accept rate the calibrated threshold is set for
+GALLERY_ANN_THRESHOLD = 4096   # switch to the approximate index above this size
+GALLERY_ANN_PROBES = 8         # clusters scanned per query
+
+# Model versioning / hot-swap
+MODEL_DIR = "checkpoints"      # versioned checkpoints loadable at runtime
+MODEL_WARMUP_RUNS = 3
+SHADOW_STATS_WINDOW = 1000     # latency samples kept for shadow p50/p99
+
+# Runtime profile written by autotune.py and applied at startup
+RUNTIME_PROFILE_PATH = "runtime_profile.json"
+
+# Access change feed (/changes)
+CHANGE_FEED_LIMIT = 1000
+CHANGE_POLL_INTERVAL = 0.5     # seconds between SSE checks for new changes
+SSE_HEARTBEAT = 15             # seconds between keep-alive comments
+
+# Upload limits (/predict, /identify, /gallery)
+MAX_UPLOAD_BYTES = 8 * 1024 * 1024          # per image
+MAX_REQUEST_BYTES = 32 * 1024 * 1024        # whole multipart body
+MAX_IMAGE_DIM = 4096                        # width / height from the header
+UPLOAD_CHUNK_SIZE = 64 * 1024
+UPLOAD_BUFFER_POOL_SIZE = 8                 # pooled MAX_UPLOAD_BYTES decode buffers
+UPLOAD_MAX_CONCURRENT_PER_CLIENT = 2
+UPLOAD_PATHS = ("/predict", "/identify", "/gallery/")
+WS_MAX_SIZE = MAX_UPLOAD_BYTES              # uvicorn ws_max_size for /ws/predict frames
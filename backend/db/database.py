@@ -57,6 +57,19 @@ def init_db():
     )
     """)
 
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs(timestamp)")
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS access_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        change_type TEXT NOT NULL,
+        user_id TEXT,
+        door_id TEXT,
+        access_granted INTEGER,
+        changed_at TEXT NOT NULL
+    )
+    """)
+
     conn.commit()
     conn.close()
     print("Database initialized with tables!")
@@ -67,6 +80,7 @@ def reset_db():
     conn = get_connection()
     cursor = conn.cursor()
 
+    cursor.execute("DROP TABLE IF EXISTS access_changes")
     cursor.execute("DROP TABLE IF EXISTS logs")
     cursor.execute("DROP TABLE IF EXISTS user_access")
     cursor.execute("DROP TABLE IF EXISTS doors")
@@ -0,0 +1,352 @@
+# gallery.py
+import json
+import os
+import threading
+
+import numpy as np
+
+from config import (
+    EMBEDDING_DIM, GALLERY_DIR, GALLERY_TARGET_FAR,
+    GALLERY_ANN_THRESHOLD, GALLERY_ANN_PROBES,
+)
+
+MATRIX_FILE = "embeddings.f32"
+IDS_FILE = "ids.bin"            # fixed-width utf-8 ids, one slot per matrix row
+COUNT_FILE = "count.json"
+CALIBRATION_FILE = "calibration.json"
+ID_BYTES = 64
+MIN_CAPACITY = 1024
+KMEANS_ITERS = 10
+
+
+class GalleryNotReady(RuntimeError):
+    """The gallery cannot serve this model (not calibrated, or built with another model)."""
+
+
+def _normalize(vec: np.ndarray) -> np.ndarray:
+    vec = np.asarray(vec, dtype=np.float32)
+    norm = np.linalg.norm(vec, axis=-1, keepdims=True)
+    return vec / np.maximum(norm, 1e-12)
+
+
+# -------- Calibration --------
+def calibrate(embeddings: np.ndarray, labels, target_far=GALLERY_TARGET_FAR) -> dict:
+    """
+    Centre and reject threshold from labelled embeddings.
+
+    Pooled post-ReLU features are all non-negative, so raw cosine similarities
+    sit close to 1 for any input; subtracting their mean spreads them out.
+    Each label is split into an enrollment half and a probe half; the
+    threshold is the impostor score quantile giving target_far, and the
+    genuine acceptance rate at that threshold is reported alongside it.
+    """
+    embeddings = _normalize(embeddings)
+    labels = np.asarray(labels)
+    center = embeddings.mean(axis=0)
+    centered = _normalize(embeddings - center)
+
+    names = [l for l in np.unique(labels) if (labels == l).sum() >= 2]
+    if len(names) < 2:
+        raise ValueError("Calibration needs at least two labels with two or more images each")
+
+    templates, probes, probe_labels = [], [], []
+    for i, name in enumerate(names):
+        rows = centered[labels == name]
+        half = len(rows) // 2
+        templates.append(_normalize(rows[:half].mean(axis=0)))
+        probes.append(rows[half:])
+        probe_labels.extend([i] * (len(rows) - half))
+
+    scores = np.concatenate(probes) @ np.stack(templates).T
+    own = np.zeros(scores.shape, dtype=bool)
+    own[np.arange(len(scores)), probe_labels] = True
+    genuine, impostor = scores[own], scores[~own]
+
+    threshold = float(np.quantile(impostor, 1.0 - target_far))
+    return {
+        "center": center.astype(np.float32),
+        "threshold": threshold,
+        "stats": {
+            "labels": len(names),
+            "images": int(np.isin(labels, names).sum()),
+            "target_far": target_far,
+            "far": float((impostor >= threshold).mean()),
+            "tar": float((genuine >= threshold).mean()),
+            "genuine_mean": float(genuine.mean()),
+            "impostor_mean": float(impostor.mean()),
+        },
+    }
+
+
+# -------- Approximate Index --------
+class IVFIndex:
+    """
+    Inverted-file index over the gallery matrix: rows are bucketed by their
+    nearest k-means centroid and a query only scans the closest buckets.
+    """
+
+    def __init__(self, matrix: np.ndarray, probes=GALLERY_ANN_PROBES, seed=0):
+        n = len(matrix)
+        self.n_lists = max(1, int(np.sqrt(n)))
+        self.probes = min(probes, self.n_lists)
+
+        rng = np.random.default_rng(seed)
+        sample = matrix[rng.choice(n, size=min(n, self.n_lists * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=self.n_lists, replace=False)].copy()
+
+        for _ in range(KMEANS_ITERS):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(self.n_lists):
+                members = sample[assign == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+
+        self.centroids = centroids
+        self.built_size = n
+        self.bucket = list(self._assign(matrix))
+        self.lists = [np.flatnonzero(np.asarray(self.bucket) == c) for c in range(self.n_lists)]
+
+    def _assign(self, rows: np.ndarray) -> np.ndarray:
+        assign = np.empty(len(rows), dtype=np.int64)
+        for start in range(0, len(rows), 65536):
+            chunk = rows[start:start + 65536]
+            assign[start:start + 65536] = np.argmax(chunk @ self.centroids.T, axis=1)
+        return assign
+
+    def _nearest(self, vec: np.ndarray) -> int:
+        return int(np.argmax(self.centroids @ vec))
+
+    def _drop(self, row: int):
+        c = self.bucket[row]
+        self.lists[c] = self.lists[c][self.lists[c] != row]
+
+    def add(self, row: int, vec: np.ndarray):
+        c = self._nearest(vec)
+        self.lists[c] = np.append(self.lists[c], row)
+        self.bucket.append(c)
+
+    def move(self, row: int, vec: np.ndarray):
+        """Re-bucket a row whose embedding changed."""
+        self._drop(row)
+        c = self._nearest(vec)
+        self.lists[c] = np.append(self.lists[c], row)
+        self.bucket[row] = c
+
+    def remove(self, row: int, last: int):
+        """Drop row; the gallery moved row `last` into its slot."""
+        self._drop(row)
+        if row != last:
+            c = self.bucket[last]
+            self.lists[c][self.lists[c] == last] = row
+            self.bucket[row] = c
+        self.bucket.pop()
+
+    def candidates(self, query: np.ndarray) -> np.ndarray:
+        scores = self.centroids @ query
+        nearest = np.argpartition(-scores, self.probes - 1)[:self.probes]
+        return np.concatenate([self.lists[c] for c in nearest])
+
+
+# -------- Gallery --------
+class EmbeddingGallery:
+    """
+    Enrolled identity embeddings kept as an L2-normalised float32 matrix in a
+    memory-mapped file, so cosine similarity is a single matrix-vector product.
+    Embeddings are centred on the calibration mean before normalising, and
+    matches are accepted against the calibrated threshold. Both belong to the
+    model the gallery was calibrated with, which is recorded by checkpoint
+    fingerprint; embeddings from any other model are refused.
+    """
+
+    def __init__(self, directory=GALLERY_DIR, dim=EMBEDDING_DIM):
+        self.directory = directory
+        self.dim = dim
+        self.lock = threading.Lock()
+        self.index = None
+
+        os.makedirs(directory, exist_ok=True)
+        self.matrix_path = os.path.join(directory, MATRIX_FILE)
+        self.ids_path = os.path.join(directory, IDS_FILE)
+        self.count_path = os.path.join(directory, COUNT_FILE)
+        self.calibration_path = os.path.join(directory, CALIBRATION_FILE)
+
+        self.center = None
+        self.threshold = None
+        self.model = None
+        self.calibration = None
+        if os.path.exists(self.calibration_path):
+            with open(self.calibration_path) as f:
+                self._set_calibration(json.load(f))
+
+        count = 0
+        if os.path.exists(self.count_path):
+            with open(self.count_path) as f:
+                count = json.load(f)["count"]
+
+        capacity = max(MIN_CAPACITY, count)
+        if os.path.exists(self.matrix_path):
+            capacity = max(capacity, os.path.getsize(self.matrix_path) // (4 * dim))
+        self._open(capacity)
+
+        self.ids = [bytes(self.id_slots[i]).rstrip(b"\0").decode() for i in range(count)]
+        self.rows = {identity: i for i, identity in enumerate(self.ids)}
+
+    @staticmethod
+    def _map(path, dtype, shape):
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        if not os.path.exists(path):
+            open(path, "wb").close()
+        if os.path.getsize(path) < size:
+            with open(path, "r+b") as f:
+                f.truncate(size)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+    def _open(self, capacity):
+        self.capacity = capacity
+        self.matrix = self._map(self.matrix_path, np.float32, (capacity, self.dim))
+        self.id_slots = self._map(self.ids_path, np.uint8, (capacity, ID_BYTES))
+
+    def _write_id(self, row, identity):
+        encoded = identity.encode()
+        self.id_slots[row] = 0
+        self.id_slots[row, :len(encoded)] = np.frombuffer(encoded, np.uint8)
+
+    def _save_count(self):
+        # O(1): row data lives in the memmaps, only the live count is rewritten
+        self.matrix.flush()
+        self.id_slots.flush()
+        tmp = self.count_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"count": len(self.ids)}, f)
+        os.replace(tmp, self.count_path)
+
+    def _set_calibration(self, calibration):
+        self.center = np.asarray(calibration["center"], dtype=np.float32)
+        self.threshold = float(calibration["threshold"])
+        self.model = calibration.get("model")
+        self.calibration = {k: v for k, v in calibration.items() if k != "center"}
+
+    def _centered(self, embeddings, fingerprint):
+        if self.center is None:
+            raise GalleryNotReady("Gallery is not calibrated; run calibrate_gallery.py")
+        if not self.model or self.model["fingerprint"] != fingerprint:
+            built = self.model["version"] if self.model else "an unknown model"
+            raise GalleryNotReady(
+                f"Gallery was built with {built}, not the active model; "
+                "recalibrate with calibrate_gallery.py --reset and re-enroll"
+            )
+        return _normalize(_normalize(embeddings) - self.center)
+
+    def set_calibration(self, center, threshold, model, stats=None):
+        """
+        Install a new centre and threshold for model ({"version", "fingerprint"});
+        only allowed on an empty gallery.
+        """
+        with self.lock:
+            if self.ids:
+                raise ValueError("Clear the gallery before recalibrating; enrolled rows use the old centre")
+            calibration = {"center": np.asarray(center, dtype=np.float32).tolist(),
+                           "threshold": float(threshold), "model": model, "stats": stats or {}}
+            tmp = self.calibration_path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(calibration, f)
+            os.replace(tmp, self.calibration_path)
+            self._set_calibration(calibration)
+
+    def clear(self):
+        """Remove every enrolled identity."""
+        with self.lock:
+            self.ids = []
+            self.rows = {}
+            self.index = None
+            self._save_count()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, identity):
+        return identity in self.rows
+
+    def enroll(self, identity: str, embeddings: np.ndarray, fingerprint: str):
+        """
+        Store the mean of one or more embeddings for identity (replacing any
+        existing one); fingerprint is the checkpoint that produced them.
+        """
+        if len(identity.encode()) > ID_BYTES:
+            raise ValueError(f"Identity longer than {ID_BYTES} bytes")
+        vec = _normalize(self._centered(np.atleast_2d(embeddings), fingerprint).mean(axis=0))
+
+        with self.lock:
+            row = self.rows.get(identity)
+            if row is None:
+                row = len(self.ids)
+                if row >= self.capacity:
+                    self.matrix.flush()
+                    self.id_slots.flush()
+                    del self.matrix, self.id_slots
+                    self._open(self.capacity * 2)
+                self.matrix[row] = vec
+                self._write_id(row, identity)
+                self.ids.append(identity)
+                self.rows[identity] = row
+                if self.index is not None:
+                    self.index.add(row, vec)
+            else:
+                self.matrix[row] = vec
+                if self.index is not None:
+                    self.index.move(row, vec)
+            self._save_count()
+
+    def remove(self, identity: str) -> bool:
+        """Remove identity; the last row is moved into its slot to keep the matrix compact."""
+        with self.lock:
+            row = self.rows.pop(identity, None)
+            if row is None:
+                return False
+            last = len(self.ids) - 1
+            if row != last:
+                moved = self.ids[last]
+                self.matrix[row] = self.matrix[last]
+                self.id_slots[row] = self.id_slots[last]
+                self.ids[row] = moved
+                self.rows[moved] = row
+            self.ids.pop()
+            if self.index is not None:
+                self.index.remove(row, last)
+            self._save_count()
+            return True
+
+    def identify(self, embedding: np.ndarray, fingerprint: str, threshold=None):
+        """Return (identity or None, similarity) for the closest enrolled embedding."""
+        query = self._centered(embedding, fingerprint).reshape(-1)
+        if threshold is None:
+            threshold = self.threshold
+
+        with self.lock:
+            n = len(self.ids)
+            if n == 0:
+                return None, 0.0
+            active = self.matrix[:n]
+
+            if n > GALLERY_ANN_THRESHOLD:
+                # Built once, then kept up to date incrementally; rebuilt only
+                # when the gallery has doubled and the centroids are stale
+                if self.index is None or n > 2 * self.index.built_size:
+                    self.index = IVFIndex(np.asarray(active))
+                rows = self.index.candidates(query)
+                if rows.size == 0:
+                    rows = np.arange(n)
+                scores = active[rows] @ query
+                best = int(np.argmax(scores))
+                row, score = int(rows[best]), float(scores[best])
+            else:
+                scores = active @ query
+                row = int(np.argmax(scores))
+                score = float(scores[row])
+
+            identity = self.ids[row]
+
+        if score < threshold:
+            return None, score
+        return identity, score
@@ -2,7 +2,8 @@
 import os
 import torch
 import torch.nn as nn
-from config import MODEL_PATH, NUM_CLASSES, CLASSES
+from config import MODEL_PATH, NUM_CLASSES, CLASSES, IMAGE_SIZE
+from runtime_profile import profile
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
@@ -27,50 +28,93 @@ class ThermalCNN(nn.Module):
         self.fc = nn.Linear(256, num_classes)
         self.relu = nn.ReLU()
 
-    def forward(self, x):
+    def features(self, x):
+        """256-d pooled features before the classifier head."""
         x = self.pool(self.relu(self.bn1(self.conv1(x))))
         x = self.pool(self.relu(self.bn2(self.conv2(x))))
         x = self.pool(self.relu(self.bn3(self.conv3(x))))
         x = self.pool(self.relu(self.bn4(self.conv4(x))))
         x = self.pool(self.relu(self.bn5(self.conv5(x))))
         x = self.adapt(x)
-        x = torch.flatten(x, 1)
-        x = self.fc(x)
-        return x
+        return torch.flatten(x, 1)
+
+    def forward(self, x):
+        return self.fc(self.features(x))
+
+
+class TracedThermalCNN(nn.Module):
+    """TorchScript-traced forward; the eager module is kept for features()."""
+
+    def __init__(self, eager: ThermalCNN):
+        super().__init__()
+        self.eager = eager.eval()
+        example = torch.zeros((1, 1, *IMAGE_SIZE), device=device)
+        with torch.no_grad():
+            self.traced = torch.jit.freeze(torch.jit.trace(self.eager, example))
+
+    def features(self, x):
+        return self.eager.features(x)
+
+    def forward(self, x):
+        return self.traced(x)
 
 
 # -------- Load Model --------
-def load_model() -> nn.Module:
-    if not os.path.exists(MODEL_PATH):
-        raise RuntimeError(f"Model not found: {MODEL_PATH}")
+def load_model(path=MODEL_PATH, backend=None, strict=False) -> nn.Module:
+    """
+    strict=False keeps the startup fallback to a partial load; runtime loads
+    pass strict=True so a mismatched checkpoint raises instead.
+    """
+    if not os.path.exists(path):
+        raise RuntimeError(f"Model not found: {path}")
     
     model = ThermalCNN().to(device)
 
     try:
-        ckpt = torch.load(MODEL_PATH, map_location=device, weights_only=True)
+        ckpt = torch.load(path, map_location=device, weights_only=True)
     except TypeError:
-        ckpt = torch.load(MODEL_PATH, map_location=device)
+        ckpt = torch.load(path, map_location=device)
 
     state = ckpt["state_dict"] if isinstance(ckpt, dict) and "state_dict" in ckpt else ckpt
 
-    try:
+    if strict:
         model.load_state_dict(state, strict=True)
-        print("Model loaded with strict=True")
-    except:
-        print("Strict=True failed, loading with strict=False")
-        model.load_state_dict(state, strict=False)
+    else:
+        try:
+            model.load_state_dict(state, strict=True)
+            print("Model loaded with strict=True")
+        except:
+            print("Strict=True failed, loading with strict=False")
+            model.load_state_dict(state, strict=False)
 
     model.eval()
+    if (backend or profile["backend"]) == "traced":
+        model = TracedThermalCNN(model)
     return model
 
 
 # -------- Predict Function --------
-def predict_tensor(model, tensor):
+def predict_probs(model, batch):
+    """Class probabilities for a (N, 1, H, W) batch as an (N, NUM_CLASSES) numpy array."""
     model.eval()
     with torch.no_grad():
-        outputs = model(tensor)
+        outputs = model(batch.to(device))
         probs = torch.softmax(outputs, dim=1)
-        conf, pred = torch.max(probs, 1)
+    return probs.cpu().numpy()
+
+
+def predict_tensor(model, tensor):
+    probs = predict_probs(model, tensor)[0]
+    pred = int(probs.argmax())
 
-    label = CLASSES[pred.item()]
-    return label, float(conf.item())
+    label = CLASSES[pred]
+    return label, float(probs[pred])
+
+
+def embed_batch(model, batch):
+    """L2-normalised float32 embeddings for a (N, 1, H, W) batch."""
+    model.eval()
+    with torch.no_grad():
+        feats = model.features(batch.to(device))
+        feats = nn.functional.normalize(feats, dim=1)
+    return feats.cpu().numpy().astype("float32")
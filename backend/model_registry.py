@@ -0,0 +1,193 @@
+# model_registry.py
+import hashlib
+import os
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+import torch
+
+from config import MODEL_PATH, MODEL_DIR, MODEL_WARMUP_RUNS, SHADOW_STATS_WINDOW, IMAGE_SIZE
+from model_loader import load_model, predict_probs, predict_tensor, device
+
+
+def checkpoint_fingerprint(path):
+    """Content hash of a checkpoint, identifying the weights independent of name."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+class ModelVersion:
+    def __init__(self, version, path, model):
+        self.version = version
+        self.path = path
+        self.model = model
+        self.fingerprint = checkpoint_fingerprint(path)
+        self.loaded_at = datetime.utcnow().isoformat()
+
+    def info(self):
+        return {"version": self.version, "path": self.path, "fingerprint": self.fingerprint,
+                "loaded_at": self.loaded_at}
+
+
+class ShadowStats:
+    """Agreement and latency of the candidate model against the active one."""
+
+    def __init__(self):
+        self.requests = 0
+        self.agreements = 0
+        self.active_ms = deque(maxlen=SHADOW_STATS_WINDOW)
+        self.candidate_ms = deque(maxlen=SHADOW_STATS_WINDOW)
+
+    def record(self, agree, active_ms, candidate_ms):
+        self.requests += 1
+        self.agreements += int(agree)
+        self.active_ms.append(active_ms)
+        self.candidate_ms.append(candidate_ms)
+
+    @staticmethod
+    def _latency(samples):
+        if not samples:
+            return None
+        arr = np.asarray(samples)
+        return {
+            "mean_ms": float(arr.mean()),
+            "p50_ms": float(np.percentile(arr, 50)),
+            "p99_ms": float(np.percentile(arr, 99)),
+        }
+
+    def summary(self):
+        return {
+            "requests": self.requests,
+            "agreement": self.agreements / self.requests if self.requests else None,
+            "active_latency": self._latency(self.active_ms),
+            "candidate_latency": self._latency(self.candidate_ms),
+        }
+
+
+def warm_up(model, runs=MODEL_WARMUP_RUNS):
+    """Run dummy batches so first real requests don't pay lazy-init costs."""
+    dummy = torch.zeros((1, 1, *IMAGE_SIZE))
+    for _ in range(runs):
+        predict_probs(model, dummy)
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+
+
+def resolve_checkpoint(name):
+    """Path of a checkpoint inside MODEL_DIR; rejects anything outside it."""
+    root = os.path.realpath(MODEL_DIR)
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.dirname(path) != root or not os.path.isfile(path):
+        raise FileNotFoundError(f"Checkpoint not found in {MODEL_DIR}: {name}")
+    return path
+
+
+class ModelRegistry:
+    """
+    Holds the active model and an optional shadow candidate.
+
+    Handlers take a reference via current() when they start, so swapping the
+    active version is a single reference assignment: in-flight requests finish
+    on the model they started with and new requests see the new one.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = ModelVersion("initial", MODEL_PATH, load_model())
+        self.candidate = None
+        self.shadow_fraction = 0.0
+        self.shadow_stats = ShadowStats()
+        self.loading = None
+        self.last_error = None
+        self.history = [self.active.info()]
+
+    def current(self):
+        return self.active.model
+
+    def current_version(self):
+        """Active ModelVersion, for callers that need the model and its identity together."""
+        return self.active
+
+    def load(self, name, version=None, shadow=False, shadow_fraction=0.1):
+        """Load, warm and install a checkpoint. Blocking; run it in the background."""
+        version = version or os.path.splitext(name)[0]
+        with self.lock:
+            if self.loading:
+                print(f"Ignoring load of {version}: already loading {self.loading}")
+                return
+            self.loading = version
+            self.last_error = None
+
+        try:
+            path = resolve_checkpoint(name)
+            model = load_model(path, strict=True)
+            warm_up(model)
+            loaded = ModelVersion(version, path, model)
+
+            with self.lock:
+                if shadow:
+                    self.candidate = loaded
+                    self.shadow_fraction = shadow_fraction
+                    self.shadow_stats = ShadowStats()
+                else:
+                    self._swap(loaded)
+            print(f"Model version {version} loaded ({'shadow' if shadow else 'active'})")
+        except Exception as e:
+            self.last_error = f"{version}: {e}"
+            print(f"Failed to load model version {version}: {e}")
+        finally:
+            self.loading = None
+
+    def _swap(self, loaded):
+        self.active = loaded
+        self.history.append(loaded.info())
+
+    def promote(self):
+        """Make the shadow candidate the active model."""
+        with self.lock:
+            if self.candidate is None:
+                return False
+            self._swap(self.candidate)
+            self.candidate = None
+            self.shadow_fraction = 0.0
+            return True
+
+    def clear_candidate(self):
+        with self.lock:
+            self.candidate = None
+            self.shadow_fraction = 0.0
+
+    def shadow_target(self):
+        """Candidate model to also score this request with, or None."""
+        candidate = self.candidate
+        if candidate is not None and random.random() < self.shadow_fraction:
+            return candidate.model
+        return None
+
+    def record_shadow(self, candidate_model, tensor, active_label, active_ms):
+        """Score tensor with the candidate and compare against the active result."""
+        start = time.perf_counter()
+        candidate_label, _ = predict_tensor(candidate_model, tensor)
+        candidate_ms = (time.perf_counter() - start) * 1000
+
+        with self.lock:
+            if self.candidate is not None and self.candidate.model is candidate_model:
+                self.shadow_stats.record(candidate_label == active_label, active_ms, candidate_ms)
+
+    def status(self):
+        return {
+            "active": self.active.info(),
+            "candidate": self.candidate.info() if self.candidate else None,
+            "shadow_fraction": self.shadow_fraction,
+            "shadow_stats": self.shadow_stats.summary() if self.candidate else None,
+            "loading": self.loading,
+            "last_error": self.last_error,
+            "history": self.history,
+        }
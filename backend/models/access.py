@@ -1,5 +1,6 @@
 import sqlite3
 from db.database import get_connection
+from models.changes import record_change, GRANT, REVOKE
 
 def grant_access(user_id, door_id, access_granted, access_updated):
     conn = get_connection()
@@ -9,6 +10,7 @@ def grant_access(user_id, door_id, access_granted, access_updated):
         INSERT OR REPLACE INTO user_access (user_id, door_id, access_granted, access_updated)
         VALUES (?, ?, ?, ?)
     """, (user_id, door_id, access_granted, access_updated))
+    record_change(cursor, GRANT, user_id, door_id, access_granted)
     conn.commit()
     conn.close()
 
@@ -25,6 +27,7 @@ def revoke_access(user_id, door_id):
     conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("DELETE FROM user_access WHERE user_id=? AND door_id=?", (user_id, door_id))
+    record_change(cursor, REVOKE, user_id, door_id)
     conn.commit()
     conn.close()
 
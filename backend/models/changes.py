@@ -0,0 +1,37 @@
+import sqlite3
+from datetime import datetime
+from db.database import get_connection
+
+# ---------------- Access change feed ----------------
+# Every grant / revoke / user delete / door delete appends a row with a
+# monotonic seq, written in the same transaction as the change itself.
+
+GRANT = "grant"
+REVOKE = "revoke"
+USER_DELETE = "user_delete"
+DOOR_DELETE = "door_delete"
+
+def record_change(cursor, change_type, user_id=None, door_id=None, access_granted=None):
+    """Append a change using the caller's cursor (commit is left to the caller)"""
+    cursor.execute("""
+        INSERT INTO access_changes (change_type, user_id, door_id, access_granted, changed_at)
+        VALUES (?, ?, ?, ?, ?)
+    """, (change_type, user_id, door_id, access_granted, datetime.utcnow().isoformat()))
+
+def get_changes_since(since, limit=1000):
+    """Changes with seq > since, oldest first"""
+    conn = get_connection()
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM access_changes WHERE seq > ? ORDER BY seq LIMIT ?", (since, limit))
+    rows = cursor.fetchall()
+    conn.close()
+    return [dict(r) for r in rows]
+
+def get_latest_seq():
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM access_changes")
+    seq = cursor.fetchone()[0]
+    conn.close()
+    return seq
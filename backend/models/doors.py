@@ -1,5 +1,9 @@
 import sqlite3
 from db.database import get_connection
+from models.changes import record_change, DOOR_DELETE
+from serialization import encode_cursor, json_object_sql
+
+DOOR_COLUMNS = ("door_id", "location")
 
 # ---------------- Doors CRUD ----------------
 
@@ -34,6 +38,15 @@ def get_all_doors():
     conn.close()
     return [dict(r) for r in rows]
 
+def get_all_doors_json():
+    """Get all doors pre-encoded as JSON bytes"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {json_object_sql(DOOR_COLUMNS)} FROM doors")
+    body = encode_cursor(cursor)
+    conn.close()
+    return body
+
 def update_door(door_id, location):
     """Update door location"""
     conn = get_connection()
@@ -47,5 +60,6 @@ def delete_door(door_id):
     conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("DELETE FROM doors WHERE door_id = ?", (door_id,))
+    record_change(cursor, DOOR_DELETE, door_id=door_id)
     conn.commit()
     conn.close()
@@ -1,4 +1,7 @@
 from db.database import get_connection
+from serialization import encode_cursor, json_object_sql
+
+LOG_COLUMNS = ("id", "timestamp", "user_id", "user_name", "door_id", "door_location", "status")
 
 def add_log(timestamp, user_id, user_name, door_id, door_location, status):
     """Insert a new log entry into DB"""
@@ -24,3 +27,15 @@ def get_logs():
 
     conn.close()
     return [dict(row) for row in rows]
+
+
+def get_logs_json():
+    """Fetch all logs (newest first) pre-encoded as JSON bytes"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(f"SELECT {json_object_sql(LOG_COLUMNS)} FROM logs ORDER BY timestamp DESC")
+    body = encode_cursor(cursor)
+
+    conn.close()
+    return body
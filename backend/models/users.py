@@ -1,5 +1,9 @@
 import sqlite3
 from db.database import DB_NAME
+from models.changes import record_change, USER_DELETE
+from serialization import encode_cursor, json_object_sql
+
+USER_COLUMNS = ("user_id", "name", "role", "last_updated")
 
 # ---------------- Users CRUD ----------------
 
@@ -21,6 +25,14 @@ def get_all_users():
     conn.close()
     return [{"user_id": r[0], "name": r[1], "role": r[2], "last_updated": r[3]} for r in rows]
 
+def get_all_users_json():
+    conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {json_object_sql(USER_COLUMNS)} FROM users")
+    body = encode_cursor(cursor)
+    conn.close()
+    return body
+
 def create_user(user_id, name, role, last_updated):
     conn = sqlite3.connect(DB_NAME)
     cursor = conn.cursor()
@@ -45,5 +57,6 @@ def delete_user(user_id):
     conn = sqlite3.connect(DB_NAME)
     cursor = conn.cursor()
     cursor.execute("DELETE FROM users WHERE user_id=?", (user_id,))
+    record_change(cursor, USER_DELETE, user_id=user_id)
     conn.commit()
     conn.close()
@@ -1,36 +1,202 @@
+"""
+Offline batch scoring of thermal images.
+
+Scores a directory, .zip or .tar(.gz) archive of images with the same
+preprocessing and model path as /predict, and writes per-image results.
+When filenames encode the label (e.g. "S3_001.png"), accuracy and a
+confusion matrix are reported as well.
+
+Run from backend/:
+    python predict_script.py path/to/images -o results.csv --workers 4
+"""
+import argparse
+import csv
+import os
+import re
+import sys
+import tarfile
+import tempfile
+import time
+import zipfile
+
 import cv2
 import numpy as np
 import torch
-import torchvision.transforms as transforms
+from torch.utils.data import Dataset, DataLoader
+
+from config import ALLOWED_EXT, CLASSES
+from preprocessing import prepare_tensor
+from model_loader import load_model, predict_probs
+from runtime_profile import profile, apply_threads
+
+
+# ---- Labels ----
+def extract_label(name):
+    """Class from a filename, mirroring extractClassFromPath in UploadAccess.jsx."""
+    base = os.path.splitext(os.path.basename(name))[0]
+    parts = [p for p in re.split(r"[_\-\s.]+", base) if p]
+    match = next((p for p in parts if re.match(r"^[A-Za-z]\d+", p)), parts[0] if parts else None)
+    return match.upper() if match else None
+
+
+# ---- Dataset ----
+class ThermalImageDataset(Dataset):
+    """Images from a directory or zip archive, decoded and preprocessed in worker processes."""
+
+    def __init__(self, root, names, archive=None):
+        self.root = root
+        self.names = names
+        self.archive = archive
+        self._zip = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def _read(self, name):
+        if self.archive is None:
+            with open(os.path.join(self.root, name), "rb") as f:
+                return f.read()
+        if self._zip is None:
+            # Opened lazily so each worker gets its own handle
+            self._zip = zipfile.ZipFile(self.archive)
+        return self._zip.read(name)
+
+    def __getitem__(self, idx):
+        arr = np.frombuffer(self._read(self.names[idx]), np.uint8)
+        img = cv2.imdecode(arr, cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            return torch.zeros((1, 1, 1)), idx, False
+        return prepare_tensor(img), idx, True
+
+
+def collate(items):
+    valid = [it for it in items if it[2]]
+    failed = [it[1] for it in items if not it[2]]
+    batch = torch.stack([it[0] for it in valid]) if valid else None
+    return batch, [it[1] for it in valid], failed
+
+
+def worker_init(_):
+    # One thread per worker; parallelism comes from the worker processes
+    cv2.setNumThreads(1)
+    torch.set_num_threads(1)
+
+
+def list_images(source, tmpdir):
+    """Return (root, names, archive) for a directory, zip or tar source."""
+    if os.path.isdir(source):
+        names = [
+            os.path.relpath(os.path.join(d, f), source)
+            for d, _, files in os.walk(source)
+            for f in files if f.lower().endswith(ALLOWED_EXT)
+        ]
+        return source, sorted(names), None
+
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as zf:
+            names = [n for n in zf.namelist() if n.lower().endswith(ALLOWED_EXT)]
+        return None, sorted(names), source
+
+    if tarfile.is_tarfile(source):
+        # Tar members are not randomly addressable (esp. .tar.gz), so unpack once
+        with tarfile.open(source) as tf:
+            members = [m for m in tf.getmembers() if m.isfile() and m.name.lower().endswith(ALLOWED_EXT)]
+            tf.extractall(tmpdir, members=members, filter="data")
+        return list_images(tmpdir, None)
+
+    raise SystemExit(f"Not a directory or supported archive: {source}")
+
+
+# ---- Reporting ----
+def write_confusion(path, matrix):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["actual\\predicted"] + CLASSES)
+        for cls, row in zip(CLASSES, matrix):
+            writer.writerow([cls] + [int(v) for v in row])
+
+
+def print_confusion(matrix):
+    width = max(len(c) for c in CLASSES) + 1
+    print(" " * width + "".join(f"{c:>{width}}" for c in CLASSES))
+    for cls, row in zip(CLASSES, matrix):
+        print(f"{cls:<{width}}" + "".join(f"{int(v):>{width}}" for v in row))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-score thermal images with ThermalCNN.")
+    parser.add_argument("source", help="directory, .zip or .tar(.gz) of images")
+    parser.add_argument("-o", "--output", default="predictions.csv", help="results CSV path")
+    parser.add_argument("-b", "--batch-size", type=int, default=profile["batch_size"])
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--log-every", type=int, default=10, help="progress interval in batches")
+    args = parser.parse_args(argv)
+
+    apply_threads(profile)
+    model = load_model()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root, names, archive = list_images(args.source, tmpdir)
+        if not names:
+            raise SystemExit("No images found")
+
+        loader = DataLoader(
+            ThermalImageDataset(root, names, archive),
+            batch_size=args.batch_size,
+            num_workers=args.workers,
+            collate_fn=collate,
+            worker_init_fn=worker_init if args.workers else None,
+            persistent_workers=False,
+        )
+
+        index = {c: i for i, c in enumerate(CLASSES)}
+        confusion = np.zeros((len(CLASSES), len(CLASSES)), dtype=np.int64)
+        labelled = correct = scored = 0
+        failed = []
 
-# ---- Preprocessing Function ----
-def preprocess_image(img):
-    """CLAHE + denoise preprocessing."""
-    if img is None:
-        raise ValueError("Image is None")
+        start = time.perf_counter()
+        with open(args.output, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["file", "prediction", "confidence", "actual", "correct"])
 
-    if img.dtype != np.uint8:
-        imgf = img.astype(np.float32)
-        imgf = imgf - imgf.min()
-        if imgf.max() > 0:
-            imgf = imgf / imgf.max()
-        img = (imgf * 255).astype(np.uint8)
+            for step, (batch, idxs, bad) in enumerate(loader, 1):
+                failed.extend(names[i] for i in bad)
+                if batch is not None:
+                    probs = predict_probs(model, batch)
+                    preds = probs.argmax(axis=1)
 
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-    img_enh = clahe.apply(img)
+                    for i, p, row in zip(idxs, preds, probs):
+                        name = names[i]
+                        label = CLASSES[int(p)]
+                        actual = extract_label(name)
+                        hit = ""
+                        if actual in index:
+                            labelled += 1
+                            confusion[index[actual], int(p)] += 1
+                            hit = int(actual == label)
+                            correct += hit
+                        writer.writerow([name, label, f"{row[p]:.4f}", actual or "", hit])
+                    scored += len(idxs)
 
-    img_denoised = cv2.GaussianBlur(img_enh, (5,5), 0)
-    return img_denoised
+                if step % args.log_every == 0 or scored + len(failed) == len(names):
+                    elapsed = time.perf_counter() - start
+                    print(
+                        f"[{scored + len(failed)}/{len(names)}] {scored / elapsed:.1f} img/s",
+                        file=sys.stderr,
+                    )
 
+    elapsed = time.perf_counter() - start
+    print(f"\nScored {scored} images in {elapsed:.2f}s ({scored / elapsed:.1f} img/s) -> {args.output}")
+    if failed:
+        print(f"Could not decode {len(failed)} files (e.g. {failed[0]})")
 
-# ---- Transform for Model ----
-transform_test = transforms.Compose([
-    transforms.ToPILImage(),
-    transforms.Grayscale(num_output_channels=1),
-    transforms.Resize((224, 224)),
-    transforms.ToTensor(),
-])
+    if labelled:
+        print(f"Accuracy: {correct / labelled:.4f} ({correct}/{labelled} labelled)\n")
+        print_confusion(confusion)
+        confusion_path = os.path.splitext(args.output)[0] + "_confusion.csv"
+        write_confusion(confusion_path, confusion)
+        print(f"\nConfusion matrix -> {confusion_path}")
 
 
-# ---- Class Labels ----
-classes = ['S1', 'S10', 'S2', 'S3', 'S4', 'S5', 'S6', 'S7', 'S8', 'S9']
+if __name__ == "__main__":
+    main()
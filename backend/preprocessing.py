@@ -1,8 +1,10 @@
 # preprocessing.py
 import cv2
 import numpy as np
+import torch
 import torchvision.transforms as transforms
 from config import IMAGE_SIZE
+from runtime_profile import profile
 
 def preprocess_image(img: np.ndarray) -> np.ndarray:
     """CLAHE + Denoise preprocessing."""
@@ -28,3 +30,17 @@ transform_test = transforms.Compose([
     transforms.Resize(IMAGE_SIZE),
     transforms.ToTensor(),
 ])
+
+
+def resize_to_tensor(img: np.ndarray) -> torch.Tensor:
+    """cv2 equivalent of transform_test for uint8 grayscale input (skips PIL)."""
+    resized = cv2.resize(img, (IMAGE_SIZE[1], IMAGE_SIZE[0]), interpolation=cv2.INTER_AREA)
+    return torch.from_numpy(resized).float().div_(255.0).unsqueeze(0)
+
+
+def prepare_tensor(img: np.ndarray, method=None) -> torch.Tensor:
+    """Preprocess a grayscale image into a (1, H, W) model input."""
+    processed = preprocess_image(img)
+    if (method or profile["preprocess"]) == "cv2":
+        return resize_to_tensor(processed)
+    return transform_test(processed)
@@ -0,0 +1,42 @@
+# runtime_profile.py
+import json
+import os
+
+import torch
+
+from config import RUNTIME_PROFILE_PATH, STREAM_BATCH_SIZE
+
+DEFAULT_PROFILE = {
+    "intra_op_threads": None,   # None = torch default
+    "inter_op_threads": None,
+    "batch_size": 64,                       # offline / throughput batches (predict_script.py)
+    "stream_batch_size": STREAM_BATCH_SIZE, # live /ws/predict batches
+    "backend": "eager",         # "eager" | "traced"
+    "preprocess": "pil",        # "pil" | "cv2"
+}
+
+
+def load_profile(path=RUNTIME_PROFILE_PATH) -> dict:
+    """Tuned runtime settings from autotune.py, falling back to defaults."""
+    profile = dict(DEFAULT_PROFILE)
+    if os.path.exists(path):
+        try:
+            with open(path) as f:
+                profile.update({k: v for k, v in json.load(f).items() if k in DEFAULT_PROFILE})
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable runtime profile {path}: {e}")
+    return profile
+
+
+def apply_threads(profile: dict):
+    """Set torch thread pools; inter-op can only be set before any parallel work."""
+    if profile.get("intra_op_threads"):
+        torch.set_num_threads(int(profile["intra_op_threads"]))
+    if profile.get("inter_op_threads"):
+        try:
+            torch.set_num_interop_threads(int(profile["inter_op_threads"]))
+        except RuntimeError as e:
+            print(f"Could not set inter-op threads: {e}")
+
+
+profile = load_profile()
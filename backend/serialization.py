@@ -0,0 +1,57 @@
+# serialization.py
+import gzip
+from sqlite3 import Cursor
+
+from fastapi import Request, Response
+from config import COMPRESSION_MIN_SIZE, GZIP_LEVEL, BROTLI_QUALITY
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+
+# -------- JSON Encoding --------
+def json_object_sql(columns) -> str:
+    """SQL expression that makes SQLite render each row as a JSON object."""
+    return "json_object(" + ", ".join(f"'{c}', {c}" for c in columns) + ")"
+
+
+def encode_cursor(cursor: Cursor) -> bytes:
+    """
+    Join the rows of a cursor selecting a single json_object_sql() column
+    into a JSON array.
+
+    SQLite encodes each row natively, so no sqlite3.Row, dict or per-value
+    Python encoding is involved before the response bytes are produced.
+    """
+    return b"[" + ",".join([row[0] for row in cursor]).encode("utf-8") + b"]"
+
+
+# -------- Compression --------
+def _accepted_encodings(request: Request) -> set:
+    header = request.headers.get("accept-encoding", "")
+    accepted = set()
+    for token in header.split(","):
+        name, _, params = token.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def json_response(request: Request, body: bytes) -> Response:
+    """Build a JSON response, compressing with br/gzip when negotiated and worthwhile."""
+    headers = {"Vary": "Accept-Encoding"}
+
+    if len(body) >= COMPRESSION_MIN_SIZE:
+        accepted = _accepted_encodings(request)
+        if brotli is not None and "br" in accepted:
+            body = brotli.compress(body, quality=BROTLI_QUALITY)
+            headers["Content-Encoding"] = "br"
+        elif "gzip" in accepted:
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+            headers["Content-Encoding"] = "gzip"
+
+    return Response(content=body, media_type="application/json", headers=headers)
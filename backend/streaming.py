@@ -0,0 +1,139 @@
+# streaming.py
+from collections import deque
+
+import cv2
+import numpy as np
+import torch
+
+from config import (
+    CLASSES, STREAM_FRAME_SKIP, STREAM_MOTION_THRESHOLD, STREAM_STATIC_REINFER,
+    STREAM_WINDOW, STREAM_MIN_FRAMES, STREAM_CONFIDENCE,
+)
+from runtime_profile import profile
+
+MOTION_SIZE = (32, 32)
+
+# Never wait for more frames than the window can smooth or a decision needs
+STREAM_BATCH = max(1, min(int(profile["stream_batch_size"]), STREAM_WINDOW, STREAM_MIN_FRAMES))
+
+# FrameStream.gate() results
+SKIPPED = "skipped"
+STATIC = "static"
+RECHECK = "recheck"   # static, but due for re-inference
+CHANGED = "changed"
+
+
+class FrameStream:
+    """
+    Per-connection state for live thermal recognition.
+
+    Frames go through frame skipping and motion gating before being queued
+    for batched inference; only every Nth static frame is re-inferred.
+    Predictions are averaged over a sliding window and a decision is emitted
+    only once the smoothed confidence is high enough. After a decision no new
+    one is made until the scene changes or the client resets.
+    """
+
+    def __init__(self):
+        self.width = None
+        self.height = None
+        self.frame_index = 0
+        self.last_motion_frame = None
+        self.static_frames = 0
+        self.decided = False
+        self.pending = []
+        self.window = deque(maxlen=STREAM_WINDOW)
+        self.inferred = 0
+
+    def configure(self, width, height):
+        """Declare the size of raw grayscale frames sent as bytes."""
+        self.width = int(width)
+        self.height = int(height)
+
+    def decode(self, data: bytes):
+        """Raw uint8 grayscale frame if the size matches, otherwise an encoded image."""
+        if not data:
+            return None
+        arr = np.frombuffer(data, np.uint8)
+        if self.width and self.height and arr.size == self.width * self.height:
+            return arr.reshape(self.height, self.width)
+        return cv2.imdecode(arr, cv2.IMREAD_GRAYSCALE)
+
+    def gate(self, img: np.ndarray) -> str:
+        """
+        Classify a frame as SKIPPED (frame skip), STATIC (no motion), RECHECK
+        (no motion, but due for re-inference) or CHANGED.
+        """
+        self.frame_index += 1
+        if STREAM_FRAME_SKIP > 1 and self.frame_index % STREAM_FRAME_SKIP:
+            return SKIPPED
+
+        small = cv2.resize(img, MOTION_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+        if self.last_motion_frame is not None:
+            motion = float(np.abs(small - self.last_motion_frame).mean())
+            if motion < STREAM_MOTION_THRESHOLD:
+                self.static_frames += 1
+                if not self.decided and self.static_frames % STREAM_STATIC_REINFER == 0:
+                    return RECHECK
+                return STATIC
+        if self.decided:
+            # The scene changed after a decision: this is a new door event
+            self._new_event()
+        self.last_motion_frame = small
+        self.static_frames = 0
+        return CHANGED
+
+    def queue(self, tensor: torch.Tensor):
+        """Queue a preprocessed CHANGED or RECHECK frame for batched inference."""
+        self.pending.append(tensor)
+
+    def batch_ready(self) -> bool:
+        return len(self.pending) >= STREAM_BATCH
+
+    def take_batch(self) -> torch.Tensor:
+        batch = torch.stack(self.pending)
+        self.pending = []
+        return batch
+
+    def update(self, probs: np.ndarray):
+        """Add a batch of class probabilities; return a decision dict once confident."""
+        for p in probs:
+            self.window.append(p)
+        self.inferred += len(probs)
+        return self._decide()
+
+    def _decide(self):
+        # The window only holds real inferences, so this needs that many of them
+        if self.decided or len(self.window) < STREAM_MIN_FRAMES:
+            return None
+
+        smoothed = np.mean(self.window, axis=0)
+        idx = int(np.argmax(smoothed))
+        confidence = float(smoothed[idx])
+        if confidence < STREAM_CONFIDENCE:
+            return None
+
+        decision = {
+            "type": "decision",
+            "prediction": CLASSES[idx],
+            "confidence": confidence,
+            "frames_received": self.frame_index,
+            "frames_inferred": self.inferred,
+        }
+        # Keep the motion reference so a subject standing still is not re-decided
+        self._new_event()
+        self.decided = True
+        return decision
+
+    def _new_event(self):
+        self.frame_index = 0
+        self.static_frames = 0
+        self.decided = False
+        self.pending = []
+        self.window.clear()
+        self.inferred = 0
+
+    def reset(self):
+        """Start a new door event (keeps the configured frame size)."""
+        self._new_event()
+        self.last_motion_frame = None
@@ -0,0 +1,258 @@
+# uploads.py
+import asyncio
+import json
+import struct
+from contextlib import asynccontextmanager
+
+import cv2
+import numpy as np
+from fastapi import HTTPException, UploadFile
+
+from config import (
+    MAX_UPLOAD_BYTES, MAX_REQUEST_BYTES, MAX_IMAGE_DIM, UPLOAD_CHUNK_SIZE,
+    UPLOAD_BUFFER_POOL_SIZE, UPLOAD_MAX_CONCURRENT_PER_CLIENT, UPLOAD_PATHS,
+)
+
+PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+JPEG_MAGIC = b"\xff\xd8\xff"
+BMP_MAGIC = b"BM"
+JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+# -------- Header Sniffing --------
+def sniff_format(head: bytes):
+    """Image format from magic bytes, or None."""
+    if head.startswith(PNG_MAGIC):
+        return "png"
+    if head.startswith(JPEG_MAGIC):
+        return "jpeg"
+    if head.startswith(BMP_MAGIC):
+        return "bmp"
+    return None
+
+
+def _jpeg_size(data):
+    i = 2
+    while i + 9 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker in JPEG_SOF:
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        (length,) = struct.unpack(">H", data[i + 2:i + 4])
+        i += 2 + length
+    return None
+
+
+def sniff_size(fmt, data):
+    """(width, height) from the image header, or None if not in data yet."""
+    if fmt == "png" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if fmt == "bmp" and len(data) >= 26:
+        width, height = struct.unpack("<ii", data[18:26])
+        return abs(width), abs(height)
+    if fmt == "jpeg":
+        return _jpeg_size(data)
+    return None
+
+
+def check_size(size):
+    width, height = size
+    if width == 0 or height == 0 or width > MAX_IMAGE_DIM or height > MAX_IMAGE_DIM:
+        raise HTTPException(status_code=413, detail=f"Image dimensions {width}x{height} not allowed")
+
+
+# -------- Buffer Pool --------
+class BufferPool:
+    """
+    Fixed set of MAX_UPLOAD_BYTES buffers reused across requests; also caps
+    how many uploads are being held in memory at once.
+    """
+
+    def __init__(self, count=UPLOAD_BUFFER_POOL_SIZE, size=MAX_UPLOAD_BYTES):
+        self.count = count
+        self.size = size
+        self.created = 0
+        self.free = None
+
+    @asynccontextmanager
+    async def acquire(self):
+        if self.free is None:
+            self.free = asyncio.Queue()
+        if self.free.empty() and self.created < self.count:
+            self.created += 1
+            buf = bytearray(self.size)
+        else:
+            buf = await self.free.get()
+        try:
+            yield buf
+        finally:
+            self.free.put_nowait(buf)
+
+
+buffer_pool = BufferPool()
+
+
+async def read_upload_image(file: UploadFile):
+    """
+    Copy an upload into a pooled buffer and decode it as grayscale.
+
+    By the time this runs Starlette has already spooled the whole part (its
+    size was capped while receiving by UploadLimitMiddleware). Here the
+    format is checked from the first chunk and the header dimensions as soon
+    as they are available, so bogus or oversized images are rejected before
+    the rest is copied or anything is decoded.
+    """
+    async with buffer_pool.acquire() as buf:
+        view = memoryview(buf)
+        n = 0
+        fmt = None
+        size = None
+
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            if n + len(chunk) > len(buf):
+                raise HTTPException(status_code=413, detail="Image too large")
+            view[n:n + len(chunk)] = chunk
+            n += len(chunk)
+
+            if fmt is None:
+                fmt = sniff_format(bytes(view[:8]))
+                if fmt is None:
+                    raise HTTPException(status_code=415, detail="Unsupported image content")
+            if size is None:
+                size = sniff_size(fmt, view[:n])
+                if size is not None:
+                    check_size(size)
+
+        if n == 0:
+            raise HTTPException(status_code=400, detail="Empty upload")
+        if size is None:
+            raise HTTPException(status_code=422, detail="Could not read image header")
+
+        # imdecode copies into a new image, so the buffer can go back to the pool
+        img = cv2.imdecode(np.frombuffer(buf, np.uint8, count=n), cv2.IMREAD_GRAYSCALE)
+
+    if img is None:
+        raise HTTPException(status_code=422, detail="Could not decode image")
+    return img
+
+
+# -------- Multipart Part Limit --------
+PART_HEADER_ALLOWANCE = 4096   # room for each part's own headers
+
+
+def multipart_boundary(content_type: bytes):
+    """Boundary from a multipart/form-data Content-Type header, or None."""
+    if not content_type.lower().startswith(b"multipart/"):
+        return None
+    for param in content_type.split(b";")[1:]:
+        name, _, value = param.strip().partition(b"=")
+        if name.lower() == b"boundary" and value:
+            return value.strip(b'"')
+    return None
+
+
+class PartSizeLimiter:
+    """
+    Tracks the size of the multipart part currently being received by
+    scanning for the boundary delimiter, so an oversized file part is
+    rejected mid-stream rather than after the whole body is spooled.
+    """
+
+    def __init__(self, boundary: bytes, max_part=MAX_UPLOAD_BYTES + PART_HEADER_ALLOWANCE):
+        self.delimiter = b"--" + boundary
+        self.max_part = max_part
+        self.part_bytes = 0
+        self.tail = b""
+
+    def feed(self, chunk: bytes):
+        data = self.tail + chunk
+        end = data.rfind(self.delimiter)
+        if end >= 0:
+            self.part_bytes = len(data) - (end + len(self.delimiter))
+        else:
+            self.part_bytes += len(chunk)
+        # Keep enough to catch a delimiter split across chunks
+        self.tail = data[-(len(self.delimiter) - 1):]
+        if self.part_bytes > self.max_part:
+            raise HTTPException(status_code=413, detail="Image too large")
+
+
+# -------- ASGI Middleware --------
+class UploadLimitMiddleware:
+    """
+    For upload routes, while the body is being received: reject it once it
+    exceeds MAX_REQUEST_BYTES or any multipart part exceeds MAX_UPLOAD_BYTES,
+    and cap concurrent uploads per client.
+    """
+
+    def __init__(self, app, max_bytes=MAX_REQUEST_BYTES, per_client=UPLOAD_MAX_CONCURRENT_PER_CLIENT):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.per_client = per_client
+        self.active = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith(UPLOAD_PATHS):
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        length = headers.get(b"content-length")
+        if length and length.isdigit() and int(length) > self.max_bytes:
+            return await self._reject(send, 413, "Upload too large")
+
+        client = scope["client"][0] if scope.get("client") else "unknown"
+        if self.active.get(client, 0) >= self.per_client:
+            return await self._reject(send, 429, "Too many concurrent uploads")
+        self.active[client] = self.active.get(client, 0) + 1
+
+        boundary = multipart_boundary(headers.get(b"content-type", b""))
+        parts = PartSizeLimiter(boundary) if boundary else None
+        received = 0
+        started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                body = message.get("body", b"")
+                received += len(body)
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail="Upload too large")
+                if parts is not None:
+                    parts.feed(body)
+            return message
+
+        async def tracking_send(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except HTTPException as e:
+            if started:
+                raise
+            await self._reject(send, e.status_code, e.detail)
+        finally:
+            self.active[client] -= 1
+            if not self.active[client]:
+                del self.active[client]
+
+    @staticmethod
+    async def _reject(send, status, detail):
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
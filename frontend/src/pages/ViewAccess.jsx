@@ -8,6 +8,10 @@ import {
 	grantAccess,
 	revokeAccess,
 } from "../services/access.service";
+import {
+	getChangeCursor,
+	subscribeChanges,
+} from "../services/changes.service";
 import { useToast } from "../components/toast/ToastContext";
 
 const USERS_PER_PAGE = 9;
@@ -53,12 +57,69 @@ export default function ViewAccess() {
 		}
 	};
 
+	// Apply one entry of the access change feed to local state
+	const applyChange = (change) => {
+		const withoutDoor = (access = []) =>
+			access.filter((a) => a.door_id !== change.door_id);
+
+		switch (change.change_type) {
+			case "grant":
+				setUsers((prev) =>
+					prev.map((u) =>
+						u.user_id === change.user_id
+							? {
+									...u,
+									access_for: [
+										...withoutDoor(u.access_for),
+										{
+											user_id: change.user_id,
+											door_id: change.door_id,
+											access_granted: change.access_granted,
+											access_updated: change.changed_at,
+										},
+									],
+							  }
+							: u
+					)
+				);
+				break;
+			case "revoke":
+				setUsers((prev) =>
+					prev.map((u) =>
+						u.user_id === change.user_id
+							? { ...u, access_for: withoutDoor(u.access_for) }
+							: u
+					)
+				);
+				break;
+			case "user_delete":
+				setUsers((prev) => prev.filter((u) => u.user_id !== change.user_id));
+				break;
+			case "door_delete":
+				setDoors((prev) => prev.filter((d) => d.door_id !== change.door_id));
+				setUsers((prev) =>
+					prev.map((u) => ({ ...u, access_for: withoutDoor(u.access_for) }))
+				);
+				break;
+			default:
+				break;
+		}
+	};
+
 	useEffect(() => {
+		let unsubscribe = () => {};
+		let cancelled = false;
+
 		const fetchData = async () => {
 			try {
+				// Take the cursor before the full load so no change is missed
+				const cursor = await getChangeCursor().catch(() => null);
 				const doorsData = await getDoors();
 				setDoors(doorsData || []);
 				await fetchUsersWithAccess();
+				if (cursor !== null && !cancelled) {
+					unsubscribe = subscribeChanges(cursor, applyChange);
+				}
 			} catch {
 				showToast("Failed to load doors", "error");
 			} finally {
@@ -66,6 +127,11 @@ export default function ViewAccess() {
 			}
 		};
 		fetchData();
+
+		return () => {
+			cancelled = true;
+			unsubscribe();
+		};
 	}, []);
 
 	const indexOfLast = currentPage * USERS_PER_PAGE;
@@ -0,0 +1,21 @@
+import api, { API_BASE_URL } from "../api/api";
+
+// Current cursor of the access change feed (take it before a full reload)
+export const getChangeCursor = async () => {
+	const response = await api.get("/changes", { params: { limit: 0 } });
+	return response.data.cursor;
+};
+
+export const getChanges = async (since) => {
+	const response = await api.get("/changes", { params: { since } });
+	return response.data;
+};
+
+// Subscribe to grants / revokes / deletes after `since`; returns an unsubscribe fn
+export const subscribeChanges = (since, onChange) => {
+	const source = new EventSource(`${API_BASE_URL}/changes/stream?since=${since}`, {
+		withCredentials: true,
+	});
+	source.addEventListener("change", (e) => onChange(JSON.parse(e.data)));
+	return () => source.close();
+};